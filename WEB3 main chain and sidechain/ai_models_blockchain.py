@@ -1,17 +1,26 @@
 from __future__ import annotations
 import abc
+import contextlib
 import dataclasses
+import inspect
 import json
 import math
 import os
+import warnings
 
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
 from common import utils
-from oracle import dataManager, datasets
+from oracle import dataManager, datasets, numba_kernels
 import torch
 import torch.nn as nn
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import DataLoader, Dataset, DistributedSampler
+
+# Let cuDNN pick the fastest kernels for the fixed window shapes the models are trained on
+torch.backends.cudnn.benchmark = True
+
+MMAP_LOAD_SUPPORTED = "mmap" in inspect.signature(torch.load).parameters
+"""Flag for whether this torch version (2.1+) can memory-map saved weights and assign them to a model"""
 
 
 class PredictModel:
@@ -20,6 +29,15 @@ class PredictModel:
     model_complexity = 0.0
     BASE_MODEL_NAME = ""
     COMPLEXITY_MULTIPLIER = 1
+    _registry: dict[str, type[PredictModel]] = {}
+    """Every subclass, keyed by both its class name and its lowercase base model name"""
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        PredictModel._registry[cls.__name__] = cls
+        # Only register names declared by the class itself so subclasses don't take over their parent's name
+        if cls.__dict__.get("BASE_MODEL_NAME"):
+            PredictModel._registry[cls.BASE_MODEL_NAME.lower()] = cls
 
     def __init__(self, model_name: str, data_handler: datasets.DataHandler, loss_fn_name: str = "mae", **kwargs):
         """Interface for unifying behavior of different predictive models
@@ -43,18 +61,19 @@ class PredictModel:
         self.kwargs = utils.flatten_locals(locals())
 
     @staticmethod
-    def get_loss_fn(name: str):
+    def get_loss_fn(name: str, reduction="mean"):
         """Gets a loss function by name
 
         :param name: The name of the loss function
+        :param reduction: The reduction applied to the element-wise losses, 'none' keeps them unreduced
         :return: The torch loss function"""
 
         if name.lower() in ["l1", "mae"]:
-            return torch.nn.L1Loss()
+            return torch.nn.L1Loss(reduction=reduction)
         elif name.lower() in ["l2", "mse"]:
-            return torch.nn.MSELoss()
+            return torch.nn.MSELoss(reduction=reduction)
         elif name.lower() in ["ce", "crossentropy"]:
-            return torch.nn.CrossEntropyLoss()
+            return torch.nn.CrossEntropyLoss(reduction=reduction)
 
     @staticmethod
     def get_optimizer(name: str):
@@ -68,20 +87,6 @@ class PredictModel:
         elif name.lower() == "sgd":
             return torch.optim.SGD
 
-    @classmethod
-    def subclass_walk(cls, target_cls):
-        """Recursively gathers all subclasses of a particular class
-
-        :param target_cls: The class to search the subclasses of
-        :return: A list of all the subclasses of this class"""
-
-        all_subs = []
-        subs = target_cls.__subclasses__()
-        all_subs.extend(subs)
-        for sub in subs:
-            all_subs.extend(cls.subclass_walk(sub))
-        return all_subs
-
     @classmethod
     def create(cls, raw_model: str, trained_model: str, data_handler: datasets.DataHandler, loss_fn_name="mae", **kwargs) -> PredictModel:
         """Creates a model based off of a model name, returning an instance based off other provided parameters
@@ -92,9 +97,9 @@ class PredictModel:
         :param loss_fn_name: The name of the loss function that the model will use
         :return: An instance of the specified model"""
 
-        for sub in cls.subclass_walk(cls):
-            if sub.__name__ == raw_model or sub.BASE_MODEL_NAME.lower() == raw_model.lower():
-                return sub(trained_model, data_handler, loss_fn_name=loss_fn_name, **kwargs)
+        sub = cls._registry.get(raw_model) or cls._registry.get(raw_model.lower())
+        if sub is not None:
+            return sub(trained_model, data_handler, loss_fn_name=loss_fn_name, **kwargs)
 
     @abc.abstractmethod
     def train_model(self, **kwargs) -> tuple[float, float]:
@@ -126,111 +131,279 @@ class PredictModel:
         ...
 
 
+def sliding_windows(data: np.ndarray, lookback: int, contiguous=False) -> np.ndarray:
+    """Creates the sliding time windows over a series, as a view over the series unless a contiguous copy is requested
+
+    :param data: The series to window, shaped (time steps, features)
+    :param lookback: The number of time steps in each window
+    :param contiguous: Flag to copy the windows into their own writeable array, which takes lookback times the memory of the series.
+        The view is read-only since its windows overlap, so the copy is needed to modify windows in place. It is made in parallel when numba is installed
+    :return: The windows, shaped (windows, lookback, features)"""
+
+    # Windows start at every time step except the last possible one
+    num_windows = len(data) - lookback
+
+    if contiguous and numba_kernels.NUMBA_AVAILABLE and num_windows > 0:
+        return numba_kernels.build_windows(data, lookback, num_windows)
+
+    windows = np.lib.stride_tricks.sliding_window_view(data, (lookback, data.shape[1]))[:, 0][:num_windows]
+    if contiguous:
+        return np.ascontiguousarray(windows)
+    return windows
+
+
+def window_tensor(windows: np.ndarray) -> torch.Tensor:
+    """Wraps an array of windows in a tensor that shares its memory
+
+    :param windows: The windows, which may be a read-only view over the cached dataset
+    :return: The tensor of the windows"""
+
+    # Torch warns that it can't protect read-only arrays, the windows are only ever read from
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="The given NumPy array is not writable")
+        return torch.from_numpy(windows)
+
+
+class SlidingWindowDataset(Dataset):
+    """Serves labeled sliding time windows to a DataLoader without copying them"""
+
+    def __init__(self, inputs: np.ndarray, targets: np.ndarray):
+        """Serves labeled sliding time windows to a DataLoader without copying them
+
+        :param inputs: The float32 input windows, shaped (windows, window length, features)
+        :param targets: The float32 target values of each window, shaped (windows, output window)"""
+
+        # The tensors share the memory of the window arrays, forked DataLoader workers see that memory as well
+        self.inputs = window_tensor(inputs)
+        self.targets = window_tensor(targets)
+
+    def __len__(self):
+        return len(self.inputs)
+
+    def __getitem__(self, index):
+        return self.inputs[index], self.targets[index]
+
+
 class BaseNN(nn.Module, PredictModel):
     """Parent class encapsulating the behaviour of other neural network classes"""
 
-    def __init__(self, model_name: str, data_handler: datasets.DataHandler, hidden_dim: int, num_hidden_layers: int, loss_fn_name: str = "mae", **kwargs):
+    HAS_UNUSED_PARAMETERS = False
+    """Flag for networks holding parameters that their forward pass never uses"""
+
+    def __init__(self, model_name: str, data_handler: datasets.DataHandler, hidden_dim: int, num_hidden_layers: int, loss_fn_name: str = "mae",
+                 compile_forward=False, **kwargs):
         """Parent class encapsulating the behaviour of other neural network classes
 
         :param model_name: The name given to this instance of a model
         :param data_handler: The handler for the dataset that the model will use
         :param hidden_dim: The dimension of the hidden layers
         :param num_hidden_layers: The number of hidden layers to put into the model
-        :param loss_fn_name: The name of the loss function that the model will use"""
+        :param loss_fn_name: The name of the loss function that the model will use
+        :param compile_forward: Flag to compile the forward pass with torch.compile when it is available"""
 
         super(BaseNN, self).__init__()
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.input_size = len(data_handler.dataframe.columns)
         self.output_size = 1
         local_args = utils.flatten_locals(locals())
         self.init(**local_args)
-
-    def train_model(self, num_epochs: int, target_attrib: str, learning_rate=0.01, optimizer_name="adam", **kwargs):
+        # Compilation is a training-time choice, models loaded for inference should not inherit it
+        self.kwargs.pop("compile_forward", None)
+
+        self._loss_fn = self.get_loss_fn(loss_fn_name)
+        self._eval_loss_fn = self.get_loss_fn(loss_fn_name, reduction="none")
+        self._col_index_cache: dict[str, int] = {}
+        self.parallel_model: DistributedDataParallel = None
+        self._compile_forward = compile_forward and hasattr(torch, "compile")
+        self._compiled_forward = self.forward
+        # Torch versions without torch.compile stay in eager mode
+        if self._compile_forward:
+            # Batch sizes vary between the tail batch and the evaluation set, so shapes are compiled as dynamic
+            self._compiled_forward = torch.compile(self.forward, dynamic=True)
+
+    def distribute(self, **ddp_kwargs):
+        """Wraps the network in DistributedDataParallel so that training synchronizes gradients across processes.
+        find_unused_parameters defaults to True for networks with parameters their forward pass never uses,
+        since DistributedDataParallel otherwise fails waiting on their gradients
+
+        :param ddp_kwargs: The keyword arguments given to DistributedDataParallel, such as device_ids"""
+
+        ddp_kwargs.setdefault("find_unused_parameters", self.HAS_UNUSED_PARAMETERS)
+        parallel_model = DistributedDataParallel(self, **ddp_kwargs)
+        # Set through __dict__ so the wrapper is not registered as a submodule of the network it wraps
+        self.__dict__["parallel_model"] = parallel_model
+        # The wrapper replaces the compiled forward pass, so it is compiled in turn when compilation was requested
+        if self._compile_forward:
+            self.__dict__["_compiled_forward"] = torch.compile(parallel_model, dynamic=True)
+        else:
+            self.__dict__["_compiled_forward"] = parallel_model
+
+    def column_index(self, attrib: str) -> int:
+        """Gets the position of a column in the dataset, caching it for later lookups
+
+        :param attrib: The name of the column
+        :return: The index of the column"""
+
+        if attrib not in self._col_index_cache:
+            self._col_index_cache[attrib] = self.data_handler.dataframe.columns.get_loc(attrib)
+        return self._col_index_cache[attrib]
+
+    def train_model(self, num_epochs: int, target_attrib: str, learning_rate=0.01, optimizer_name="adam", batch_size=64, num_workers=0,
+                    accum_steps=1, **kwargs):
         """Trains the current neural net, giving regular eval updates over
 
         :param num_epochs: The number of epochs to train the model for
         :param target_attrib: The attribute of the dataset to serve as the classifier
         :param learning_rate: The learning rate ofr training
-        :param optimizer_name: The name of the optimizer to use while training"""
-
-        loss_fn = self.get_loss_fn(self.loss_fn_name)
+        :param optimizer_name: The name of the optimizer to use while training
+        :param batch_size: The number of samples given to the model per optimization step
+        :param num_workers: The number of background processes preparing batches, capped at the number of CPUs.
+            Batches are prepared in the training process when 0
+        :param accum_steps: The number of batches to accumulate gradients over before each optimizer step
+        :return: The accuracy and loss of the trained model, only evaluated by the first process when distributed"""
+
+        loss_fn = self._loss_fn
         optimizer = self.get_optimizer(optimizer_name)(self.parameters(), lr=learning_rate)
 
         x_train, y_train, x_test, y_test = self.preprocess_data(target_attrib=target_attrib, **kwargs)
+        train_set = SlidingWindowDataset(x_train, y_train)
+
+        # Workers prefetch a bounded number of batches each to avoid running out of memory
+        num_workers = min(int(num_workers), os.cpu_count() or 1)
+        worker_args = {"num_workers": num_workers, "prefetch_factor": 2, "persistent_workers": True} if num_workers > 0 else {}
+        # Distributed training gives each process its own shard of the dataset instead of all of it
+        sampler = DistributedSampler(train_set) if self.parallel_model is not None else None
+        # Only one process evaluates, prints and plots when distributed
+        is_main_process = self.parallel_model is None or torch.distributed.get_rank() == 0
+        # Pinned host memory lets the copies to the GPU overlap with compute
+        train_loader = DataLoader(train_set, batch_size=int(batch_size), shuffle=sampler is None, sampler=sampler,
+                                  pin_memory=self.device.type == "cuda", **worker_args)
+        # Mixed precision is only used on the GPU, the scaler keeps small fp16 gradients from underflowing
+        use_amp = self.device.type == "cuda"
+        if hasattr(torch.amp, "GradScaler"):
+            scaler = torch.amp.GradScaler(self.device.type, enabled=use_amp)
+        else:
+            # Older torch versions only provide the CUDA specific scaler
+            scaler = torch.cuda.amp.GradScaler(enabled=use_amp)
+
+        accum_steps = max(int(accum_steps), 1)
+        optimizer.zero_grad(set_to_none=True)
         for epoch in range(int(num_epochs)):
-            for input_sequence, target in zip(x_train, y_train):
-                input_sequence: torch.FloatTensor = torch.from_numpy(input_sequence).type('torch.FloatTensor')
-                target = torch.tensor(target).type('torch.FloatTensor')
-
-                # Query model
-                output = self.query_model(input_sequence)
-
-                loss = loss_fn(output, target)
-
-                # Backward pass
-                optimizer.zero_grad()
-                loss.backward()
-                optimizer.step()
-
-            if epoch % 20 == 0:
+            if sampler is not None:
+                # Reshuffles the shards differently on every epoch
+                sampler.set_epoch(epoch)
+
+            for step, (input_batch, target_batch) in enumerate(train_loader):
+                input_batch = input_batch.to(self.device, non_blocking=True)
+                target_batch = target_batch.to(self.device, non_blocking=True)
+
+                update_step = (step + 1) % accum_steps == 0 or step + 1 == len(train_loader)
+                # The last group of an epoch may hold fewer batches than accum_steps
+                group_size = min(accum_steps, len(train_loader) - step // accum_steps * accum_steps)
+                # Distributed gradients only need to be all-reduced on the steps that update the weights
+                sync_context = contextlib.nullcontext()
+                if self.parallel_model is not None and not update_step:
+                    sync_context = self.parallel_model.no_sync()
+
+                with sync_context:
+                    with torch.autocast(device_type=self.device.type, dtype=torch.float16, enabled=use_amp):
+                        # Query model
+                        output = self.query_model(input_batch)
+
+                        loss = loss_fn(output, target_batch) / group_size
+
+                    # Backward pass
+                    scaler.scale(loss).backward()
+
+                if update_step:
+                    scaler.step(optimizer)
+                    scaler.update()
+                    optimizer.zero_grad(set_to_none=True)
+
+            if epoch % 20 == 0 and is_main_process:
                 print(f"Evaluation for epoch {epoch}")
-                accuracy, loss = self.eval_model(target_attrib, **kwargs)
+                accuracy, loss = self.eval_model(target_attrib, test_set=(x_test, y_test), **kwargs)
                 print(f"Accuracy: {accuracy}")
                 print(f"Loss: {loss}")
 
-        accuracy, loss = self.eval_model(target_attrib, **kwargs)
+        if not is_main_process:
+            return None, None
+
+        accuracy, loss = self.eval_model(target_attrib, test_set=(x_test, y_test), **kwargs)
         print(f"Accuracy: {accuracy}")
         print(f"Loss: {loss}")
 
         return accuracy, loss
 
-    def eval_model(self, target_attrib: str, plot_eval=True, **kwargs):
+    def eval_model(self, target_attrib: str, plot_eval=True, test_set: tuple[np.ndarray, np.ndarray] = None, **kwargs):
         """Evaluates the performance of the network
 
         :param target_attrib: The attribute of the dataset to serve as the classifier
         :param plot_eval: Flag to govern weather pyplots will be generated during evaluation
+        :param test_set: The already preprocessed testing inputs and targets, preprocessed from the dataset when not given
         :return: The average accuracy of the model and the average loss of the value"""
 
-        loss_fn = self.get_loss_fn(self.loss_fn_name)
-        total_loss = 0
-        total_accuracy = 0
-        total_entries = 0
-
-        target_attrib_idx = self.data_handler.dataframe.columns.get_loc(target_attrib)
-        _, _, x_test, y_test = self.preprocess_data(target_attrib=target_attrib, **kwargs)
+        loss_fn = self._eval_loss_fn
+
+        target_attrib_idx = self.column_index(target_attrib)
+        if test_set is None:
+            _, _, x_test, y_test = self.preprocess_data(target_attrib=target_attrib, **kwargs)
+        else:
+            x_test, y_test = test_set
+
+        input_batch = window_tensor(x_test).to(self.device)
+        target_batch = window_tensor(y_test).to(self.device)
+
+        # Query model on the whole testing set at once, disabling dropout and autograd tracking
+        was_training = self.training
+        self.eval()
+        try:
+            with torch.inference_mode():
+                output = self.query_model(input_batch)
+                # Average the losses within each sample so accuracy is scored per sample
+                losses = loss_fn(output, target_batch)
+                losses = losses.reshape(len(losses), -1).mean(dim=1)
+                accuracy, loss = torch.stack([torch.sigmoid(-losses+math.e**2).mean(), losses.mean()]).tolist()
+        finally:
+            self.train(was_training)
 
-        outputs = []
-        targets = []
-        for input_sequence, target in zip(x_test, y_test):
-            input_sequence = torch.from_numpy(input_sequence).type('torch.FloatTensor')
-            target = torch.tensor(target).type('torch.FloatTensor')
-
-            # Query model
-            output = self.query_model(input_sequence)
+        if plot_eval:
+            # Imported here since pyplot is slow to import and only needed when plotting
+            import matplotlib.pyplot as plt
 
-            outputs.append(input_sequence[:, target_attrib_idx].tolist()+([0]*self.kwargs.get("time_lag", 0))+output.tolist())
-            targets.append(input_sequence[:, target_attrib_idx].tolist()+([0]*self.kwargs.get("time_lag", 0))+target.tolist())
-            total_accuracy += torch.sigmoid(-loss_fn(output, target)+math.e**2).item()
-            total_loss += loss_fn(output, target).item()
-            total_entries += 1
+            # Only the last sample of the testing set is plotted
+            history = input_batch[-1, :, target_attrib_idx].cpu().tolist()+([0]*self.kwargs.get("time_lag", 0))
+            outputs = history+output[-1].cpu().tolist()
+            targets = history+target_batch[-1].cpu().tolist()
 
-        if plot_eval:
-            plt.plot(range(len(outputs[-1])), outputs[-1])
-            plt.plot(range(len(outputs[-1])), targets[-1], '-.')
+            plt.plot(range(len(outputs)), outputs)
+            plt.plot(range(len(outputs)), targets, '-.')
             plt.ylabel('Output')
             plt.xlabel('Time')
             plt.title(f"{self.BASE_MODEL_NAME} predictions with a time lag of {self.kwargs.get('time_lag', 0)}\n"
-                      f"Acc: {round(total_accuracy / total_entries, 2)}, Loss: {round(total_loss / total_entries, 2)}")
+                      f"Acc: {round(accuracy, 2)}, Loss: {round(loss, 2)}")
             plt.show()
 
-        return total_accuracy / total_entries, total_loss / total_entries
+        return accuracy, loss
 
     def save(self, save_location):
-        torch.save(self.state_dict(), save_location)
+        # The zipfile format is what allows the weights to be memory-mapped when loading.
+        # Written to a temporary file first since loaded weights may still be mapped from the file being replaced
+        temp_location = f"{save_location}.tmp"
+        torch.save(self.state_dict(), temp_location, _use_new_zipfile_serialization=True)
+        os.replace(temp_location, save_location)
         model_attribs = {"BASE_MODEL_NAME": self.BASE_MODEL_NAME, **self.kwargs}
         return model_attribs
 
     def load(self, save_location):
-        self.load_state_dict(torch.load(save_location))
+        if not MMAP_LOAD_SUPPORTED:
+            self.load_state_dict(torch.load(save_location, map_location=self.device))
+            return
+
+        # Memory-map the weights so they are paged in on use instead of read onto the heap up front
+        state_dict = torch.load(save_location, map_location="cpu", mmap=True, weights_only=True)
+        self.load_state_dict(state_dict, assign=True)
+        self.to(self.device)
 
     @abc.abstractmethod
     def query_model(self, input_sequence, **kwargs):
@@ -238,11 +411,12 @@ class BaseNN(nn.Module, PredictModel):
         ...
 
     @abc.abstractmethod
-    def preprocess_data(self, target_attrib: str, sub_split_value=None, **kwargs):
+    def preprocess_data(self, target_attrib: str, sub_split_value=None, contiguous_windows=False, **kwargs):
         """Processes the dataframe from the data handler into labeled training and testing sets
 
         :param target_attrib: The attribute of the dataset to serve as the classifier
         :param sub_split_value: The value used to split the data along the saved sub_split attribute
+        :param contiguous_windows: Flag to copy the sliding windows into their own writeable array instead of a read-only view of the dataset
         :return: The labeled training and testing sets"""
         ...
 
@@ -256,7 +430,7 @@ class RNN(BaseNN):
     COMPLEXITY_MULTIPLIER = 0.000017
 
     def __init__(self, model_name: str, data_handler: datasets.DataHandler, hidden_dim: int, num_hidden_layers: int,
-                 loss_fn_name="mae", time_lag=1, training_lookback=2, **_):
+                 loss_fn_name="mae", time_lag=1, training_lookback=2, compile_forward=False, **_):
         """RNN implementation
 
         :param model_name: The name given to this instance of a model
@@ -265,23 +439,25 @@ class RNN(BaseNN):
         :param num_hidden_layers: The number of hidden layers to put into the model
         :param loss_fn_name: The name of the loss function that the model will use
         :param time_lag: The time lag between the input and output sequences
-        :param training_lookback: The size of the sliding time window to give to recurrent models"""
+        :param training_lookback: The size of the sliding time window to give to recurrent models
+        :param compile_forward: Flag to compile the forward pass with torch.compile when it is available"""
 
         if training_lookback <= time_lag:
             raise ValueError(f"lookback ({training_lookback}) must be greater than the current network time lag ({time_lag})!")
 
-        super(RNN, self).__init__(model_name, data_handler, hidden_dim, num_hidden_layers, loss_fn_name, time_lag=time_lag,
-                                  training_lookback=training_lookback)
+        super(RNN, self).__init__(model_name, data_handler, hidden_dim, num_hidden_layers, loss_fn_name, compile_forward,
+                                  time_lag=time_lag, training_lookback=training_lookback)
         self.output_size = 1
         self.hidden_dim = hidden_dim
         self.num_hidden_layers = num_hidden_layers
 
         # RNN
-        self.rnn = nn.RNN(self.input_size, hidden_dim, num_hidden_layers, nonlinearity='relu')
+        self.rnn = nn.RNN(self.input_size, hidden_dim, num_hidden_layers, nonlinearity='relu', batch_first=False)
         # Fully connected
         self.fc = nn.Linear(hidden_dim, self.output_size)
 
         self.model_complexity = self.COMPLEXITY_MULTIPLIER * (self.input_size + hidden_dim*num_hidden_layers + self.output_size)
+        self.to(self.device)
 
     def forward(self, x):
         # Initialize hidden state with zeros
@@ -291,31 +467,42 @@ class RNN(BaseNN):
         out = self.fc(out)
         return out
 
+    @staticmethod
+    def sequence_first(input_sequence: torch.FloatTensor):
+        """Converts a batch-first batch of sequences into the sequence-first layout expected by the recurrent layers
+
+        :param input_sequence: The input sequence or batch of input sequences
+        :return: The input in sequence-first layout"""
+
+        # Contiguous sequence-first batches are what the fused cuDNN kernels consume
+        if len(input_sequence.shape) == 3:
+            return input_sequence.transpose(0, 1).contiguous()
+        return input_sequence
+
     def query_model(self, input_sequence: torch.FloatTensor, **kwargs):
+        # Inputs may be given on the CPU while the network sits on the GPU
+        input_sequence = input_sequence.to(self.device, non_blocking=True)
+
         # Forward pass
-        output = self.forward(input_sequence)
+        output = self._compiled_forward(self.sequence_first(input_sequence))
         # If output is given in batches, choose the output that matches the time lag
-        if len(output.shape) == 2:
+        if len(output.shape) == 3:
+            output = output[:, :, -1].transpose(0, 1)
+        elif len(output.shape) == 2:
             output = output[:, -1]
 
         return output
 
-    def preprocess_data(self, target_attrib: str, sub_split_value=None, **_):
+    def preprocess_data(self, target_attrib: str, sub_split_value=None, contiguous_windows=False, **_):
 
-        selected_data = self.data_handler.dataframe
+        selected_data = self.data_handler.numpy_cache()
 
         if sub_split_value is not None:
-            selected_data = self.data_handler.sub_splits()[sub_split_value]
-
-        selected_data = selected_data.astype(dtype=float).to_numpy()
-        time_series = []
+            selected_data = selected_data[self.data_handler.sub_split_indices()[sub_split_value]]
 
         # Sliding window data
-        for index in range(len(selected_data) - self.kwargs["training_lookback"]):
-            time_series.append(selected_data[index: index + self.kwargs["training_lookback"]])
-
+        time_series = sliding_windows(selected_data, self.kwargs["training_lookback"], contiguous_windows)
         train_len = int(0.8*len(time_series))
-        time_series = np.array(time_series)
 
         output_window = self.kwargs["training_lookback"] - self.kwargs["time_lag"]
 
@@ -323,7 +510,7 @@ class RNN(BaseNN):
         x_train = time_series[:train_len, :, :]
         x_test = time_series[train_len:, :]
 
-        target_attrib_idx = self.data_handler.dataframe.columns.get_loc(target_attrib)
+        target_attrib_idx = self.column_index(target_attrib)
         y_train = time_series[:train_len, -output_window:, target_attrib_idx]
         y_test = time_series[train_len:, -output_window:, target_attrib_idx]
 
@@ -337,9 +524,11 @@ class GRU(RNN):
 
     BASE_MODEL_NAME = "GRU"
     COMPLEXITY_MULTIPLIER = 0.000024
+    # The RNN layer built by the parent class is kept so saved models still load, but forward never uses it
+    HAS_UNUSED_PARAMETERS = True
 
     def __init__(self, model_name: str, data_handler: datasets.DataHandler, hidden_dim: int, num_hidden_layers: int,
-                 loss_fn_name="mae", time_lag=1, training_lookback=2, drop_prob=0.0, **_):
+                 loss_fn_name="mae", time_lag=1, training_lookback=2, drop_prob=0.0, compile_forward=False, **_):
         """GRU implementation
 
         :param model_name: The name given to this instance of a model
@@ -349,19 +538,21 @@ class GRU(RNN):
         :param loss_fn_name: The name of the loss function that the model will use
         :param time_lag: The time lag between the input and output sequences
         :param training_lookback: The size of the sliding time window to give to recurrent models
-        :param drop_prob: Probability of dropout"""
+        :param drop_prob: Probability of dropout
+        :param compile_forward: Flag to compile the forward pass with torch.compile when it is available"""
 
         super(GRU, self).__init__(model_name, data_handler, hidden_dim, num_hidden_layers, loss_fn_name, time_lag=time_lag,
-                                  training_lookback=training_lookback, drop_prob=drop_prob)
+                                  training_lookback=training_lookback, drop_prob=drop_prob, compile_forward=compile_forward)
         self.hidden_dim = hidden_dim
         self.num_hidden_layers = num_hidden_layers
 
         # GRU
-        self.gru = nn.GRU(self.input_size, hidden_dim, num_hidden_layers, dropout=drop_prob)
+        self.gru = nn.GRU(self.input_size, hidden_dim, num_hidden_layers, dropout=drop_prob, batch_first=False)
         self.fc = nn.Linear(hidden_dim, self.output_size)
         self.relu = nn.ReLU()
 
         self.model_complexity = self.COMPLEXITY_MULTIPLIER * (self.input_size + hidden_dim * num_hidden_layers + self.output_size)
+        self.to(self.device)
 
     def forward(self, x):
         out, h = self.gru(x)
@@ -374,10 +565,15 @@ class GRU(RNN):
         return hidden
 
     def query_model(self, input_sequence: torch.FloatTensor, **kwargs):
+        # Inputs may be given on the CPU while the network sits on the GPU
+        input_sequence = input_sequence.to(self.device, non_blocking=True)
+
         # Forward pass
-        output = self.forward(input_sequence)
+        output = self._compiled_forward(self.sequence_first(input_sequence))
         # If output is given in batches, choose the output that matches the time lag
-        if len(output.shape) == 2:
+        if len(output.shape) == 3:
+            output = output[self.kwargs["time_lag"]:, :, 0].transpose(0, 1)
+        elif len(output.shape) == 2:
             output = output[self.kwargs["time_lag"]:, 0]
 
         return output
@@ -391,9 +587,11 @@ class LSTM(RNN):
 
     BASE_MODEL_NAME = "LSTM"
     COMPLEXITY_MULTIPLIER = 0.000022
+    # The RNN layer built by the parent class is kept so saved models still load, but forward never uses it
+    HAS_UNUSED_PARAMETERS = True
 
     def __init__(self, model_name: str, data_handler: datasets.DataHandler, hidden_dim: int, num_hidden_layers: int,
-                 loss_fn_name="mae", time_lag=1, training_lookback=2, drop_prob=0.0, **_):
+                 loss_fn_name="mae", time_lag=1, training_lookback=2, drop_prob=0.0, compile_forward=False, **_):
         """LSTM implementation
 
         :param model_name: The name given to this instance of a model
@@ -403,20 +601,22 @@ class LSTM(RNN):
         :param loss_fn_name: The name of the loss function that the model will use
         :param time_lag: The time lag between the input and output sequences
         :param training_lookback: The size of the sliding time window to give to recurrent models
-        :param drop_prob: Probability of dropout"""
+        :param drop_prob: Probability of dropout
+        :param compile_forward: Flag to compile the forward pass with torch.compile when it is available"""
 
         super(LSTM, self).__init__(model_name, data_handler, hidden_dim, num_hidden_layers, loss_fn_name, time_lag=time_lag,
-                                   training_lookback=training_lookback, drop_prob=drop_prob)
+                                   training_lookback=training_lookback, drop_prob=drop_prob, compile_forward=compile_forward)
         self.hidden_dim = hidden_dim
         self.num_hidden_layers = num_hidden_layers
 
         # LSTM
-        self.lstm = nn.LSTM(self.input_size, hidden_dim, num_hidden_layers, dropout=drop_prob)
+        self.lstm = nn.LSTM(self.input_size, hidden_dim, num_hidden_layers, dropout=drop_prob, batch_first=False)
         # Fully connected layer
         self.fc = nn.Linear(hidden_dim, self.output_size)
         self.relu = nn.ReLU()
 
         self.model_complexity = self.COMPLEXITY_MULTIPLIER * (self.input_size + hidden_dim*num_hidden_layers + self.output_size)
+        self.to(self.device)
 
     def forward(self, x):
         out, h = self.lstm(x)
@@ -429,15 +629,6 @@ class LSTM(RNN):
                   weight.new(self.n_layers, batch_size, self.hidden_dim).zero_())
         return hidden
 
-    def query_model(self, input_sequence: torch.FloatTensor, **kwargs):
-        # Forward pass
-        output = self.forward(input_sequence)
-        # If output is given in batches, choose the output that matches the time lag
-        if len(output.shape) == 2:
-            output = output[:, -1]
-
-        return output
-
 
 class MLP(BaseNN):
     """Multi-layered perceptron implementation"""
@@ -445,16 +636,18 @@ class MLP(BaseNN):
     BASE_MODEL_NAME = "MLP"
     COMPLEXITY_MULTIPLIER = 0.00001
 
-    def __init__(self, model_name: str, data_handler: datasets.DataHandler, hidden_dim: int, num_hidden_layers: int, loss_fn_name: str = "mae", **_):
+    def __init__(self, model_name: str, data_handler: datasets.DataHandler, hidden_dim: int, num_hidden_layers: int, loss_fn_name: str = "mae",
+                 compile_forward=False, **_):
         """Multi-layered perceptron implementation
 
         :param model_name: The name given to this instance of a model
         :param data_handler: The handler for the dataset that the model will use
         :param hidden_dim: The dimension of the hidden layers
         :param num_hidden_layers: The number of hidden layers to put into the model
-        :param loss_fn_name: The name of the loss function that the model will use"""
+        :param loss_fn_name: The name of the loss function that the model will use
+        :param compile_forward: Flag to compile the forward pass with torch.compile when it is available"""
 
-        super(MLP, self).__init__(model_name, data_handler, hidden_dim, num_hidden_layers, loss_fn_name)
+        super(MLP, self).__init__(model_name, data_handler, hidden_dim, num_hidden_layers, loss_fn_name, compile_forward)
         # Fully connected layers
         fcs = [nn.Linear(self.input_size, hidden_dim), nn.ReLU()]
         for _ in range(num_hidden_layers-1):
@@ -465,38 +658,39 @@ class MLP(BaseNN):
         self.seq = nn.Sequential(*fcs)
 
         self.model_complexity = self.COMPLEXITY_MULTIPLIER * (self.input_size + hidden_dim*num_hidden_layers + self.output_size)
+        self.to(self.device)
 
     def forward(self, x):
         out = self.seq(x)
         return out
 
     def query_model(self, input_sequence: torch.FloatTensor, **kwargs):
+        # Inputs may be given on the CPU while the network sits on the GPU
+        input_sequence = input_sequence.to(self.device, non_blocking=True)
+
         # Forward pass
-        output = self.forward(input_sequence)
+        output = self._compiled_forward(input_sequence)
+        # Batched input keeps its batch dimension in front
+        if len(output.shape) == 3:
+            return output[:, 0]
         return output[0]
 
-    def preprocess_data(self, target_attrib: str, sub_split_value=None, **_):
+    def preprocess_data(self, target_attrib: str, sub_split_value=None, contiguous_windows=False, **_):
 
-        selected_data = self.data_handler.dataframe
+        selected_data = self.data_handler.numpy_cache()
 
         if sub_split_value is not None:
-            selected_data = self.data_handler.sub_splits()[sub_split_value]
-
-        selected_data = selected_data.astype(dtype=float).to_numpy()
-        time_series = []
+            selected_data = selected_data[self.data_handler.sub_split_indices()[sub_split_value]]
 
         # Sliding window data
-        for index in range(len(selected_data) - 2):
-            time_series.append(selected_data[index: index + 2])
-
+        time_series = sliding_windows(selected_data, 2, contiguous_windows)
         train_len = int(0.8*len(time_series))
-        time_series = np.array(time_series)
 
         # Split into training and testing sets
         x_train = time_series[:train_len, :-1, :]
         x_test = time_series[train_len:, :-1]
 
-        target_attrib_idx = self.data_handler.dataframe.columns.get_loc(target_attrib)
+        target_attrib_idx = self.column_index(target_attrib)
         y_train = time_series[:train_len, -1:, target_attrib_idx]
         y_test = time_series[train_len:, -1:, target_attrib_idx]
 
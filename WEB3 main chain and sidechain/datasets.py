@@ -4,6 +4,7 @@ import json
 
 import requests
 import os
+import numpy as np
 import pandas as pd
 
 from oracle import dataManager
@@ -29,6 +30,8 @@ class DataHandler:
         self.sub_split_attrib = sub_split_attrib
         self._data: str = None
         self._dataframe: pd.DataFrame = None
+        self._numpy: np.ndarray = None
+        self._sub_split_indices: dict = None
 
     @property
     def data(self):
@@ -46,6 +49,15 @@ class DataHandler:
             self._dataframe = self.load()
         return self._dataframe
 
+    def numpy_cache(self) -> np.ndarray:
+        """Gets the dataset as a float32 numpy array, converting the dataframe only on the first call
+
+        :return: The numpy array of the dataset"""
+
+        if self._numpy is None:
+            self._numpy = self.dataframe.astype(np.float32).to_numpy(copy=False)
+        return self._numpy
+
     def load(self):
         """Loads in the dataset as a dataframe
 
@@ -63,6 +75,16 @@ class DataHandler:
         unique_grouping = self.dataframe.groupby(self.sub_split_attrib)
         return {key: unique_grouping.get_group(key) for key in unique_grouping.groups.keys() if key != self.sub_split_attrib}
 
+    def sub_split_indices(self) -> dict:
+        """Gets the row positions of each part of the dataset split by `self.sub_split_attrib`, grouping the dataset only on the first call
+
+        :return: A dictionary containing the row positions of each split section of the dataset"""
+
+        if self._sub_split_indices is None:
+            unique_grouping = self.dataframe.groupby(self.sub_split_attrib)
+            self._sub_split_indices = {key: indices for key, indices in unique_grouping.indices.items() if key != self.sub_split_attrib}
+        return self._sub_split_indices
+
     @classmethod
     def create(cls, env: str, dataset_name: str, time_attrib: str, sub_split_attrib=""):
         """Creates a handler based off of the environment name
@@ -0,0 +1,35 @@
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+NUMBA_AVAILABLE = numba is not None
+"""Flag for whether numba is installed and the kernels in this module can be used"""
+
+
+if NUMBA_AVAILABLE:
+    @numba.njit(parallel=True, cache=True)
+    def _build_windows(data, lookback, out):
+        # Each window is filled independently, so windows are split across threads
+        for i in numba.prange(out.shape[0]):
+            for t in range(lookback):
+                for f in range(data.shape[1]):
+                    out[i, t, f] = data[i + t, f]
+
+
+def build_windows(data: np.ndarray, lookback: int, num_windows: int) -> np.ndarray:
+    """Copies the sliding time windows over a series into a new contiguous array, filling the windows in parallel
+
+    :param data: The series to window, shaped (time steps, features)
+    :param lookback: The number of time steps in each window
+    :param num_windows: The number of windows to build, starting from the first time step
+    :return: The windows, shaped (num_windows, lookback, features)"""
+
+    if not NUMBA_AVAILABLE:
+        raise ImportError("numba is required to build windows with the parallel kernel!")
+
+    out = np.empty((num_windows, lookback, data.shape[1]), dtype=data.dtype)
+    _build_windows(data, lookback, out)
+    return out